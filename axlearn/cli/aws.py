@@ -4,7 +4,7 @@
 
 import logging
 
-from axlearn.cli.utils import CommandGroup, get_path
+from axlearn.cli.utils import CommandGroup
 from axlearn.cloud.common.config import load_configs
 from axlearn.cloud.common.docker import registry_from_repo
 from axlearn.cloud.common.utils import infer_cli_name
@@ -18,6 +18,8 @@ def add_cmd_group(*, parent: CommandGroup):
 
     _, aws_configs = load_configs(CONFIG_NAMESPACE, required=True)
     active_config = aws_configs.get("_active", None)
+    # Settings of the active project, if any.
+    active_settings = aws_configs.get(active_config, None) or {}
 
     if active_config is None:
         logging.warning(
@@ -26,12 +28,8 @@ def add_cmd_group(*, parent: CommandGroup):
         )
 
     # Set common flags.
-    aws_cmd.add_flag(
-        "--project", undefok=True, default=get_path(aws_configs, f"{active_config}.project", None)
-    )
-    aws_cmd.add_flag(
-        "--region", undefok=True, default=get_path(aws_configs, f"{active_config}.aws_region", None)
-    )
+    aws_cmd.add_flag("--project", undefok=True, default=active_settings.get("project", None))
+    aws_cmd.add_flag("--region", undefok=True, default=active_settings.get("aws_region", None))
 
     # Configure projects.
     aws_cmd.add_cmd_from_module(
@@ -83,8 +81,8 @@ def add_cmd_group(*, parent: CommandGroup):
     """
 
     # Auth command.
-    docker_repo = get_path(aws_configs, f"{active_config}.docker_repo", None)
-    aws_region = get_path(aws_configs, f"{active_config}.aws_region")
+    docker_repo = active_settings.get("docker_repo", None)
+    aws_region = active_settings.get("aws_region", None)
     #auth_command = "gcloud auth login && gcloud auth application-default login"
     auth_command = "aws configure"
     if docker_repo:
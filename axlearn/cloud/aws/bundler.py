@@ -17,9 +17,11 @@ Examples (elastic container registry):
 
 """
 
+import base64
 import os
 import subprocess
-from typing import Dict
+import time
+from typing import Dict, Optional, Tuple
 
 from absl import app, flags, logging
 
@@ -32,6 +34,45 @@ from axlearn.cloud.aws.config import aws_settings
 from axlearn.cloud.aws.utils import common_flags
 
 FLAGS = flags.FLAGS
+# Log in to ECR again if the token docker is logged in with expires within this many seconds.
+_ECR_TOKEN_MIN_TTL_S = 15 * 60
+# Maps (region, registry) to the expiry timestamp of the token docker is logged in with.
+_ecr_login_expiry: Dict[Tuple[Optional[str], str], float] = {}
+
+
+def _ecr_login(*, region: Optional[str], registry: str):
+    """Logs docker in to the given ECR registry.
+
+    ECR tokens are valid for 12 hours, so the login is skipped if a previous login in this process
+    is still valid for at least `_ECR_TOKEN_MIN_TTL_S`.
+
+    Args:
+        region: AWS region of the registry. If None, uses the default region.
+        registry: The registry to log in to.
+
+    Raises:
+        subprocess.CalledProcessError: If docker login fails.
+    """
+    key = (region, registry)
+    if _ecr_login_expiry.get(key, 0) - time.time() > _ECR_TOKEN_MIN_TTL_S:
+        logging.debug("Reusing docker login for %s.", registry)
+        return
+    # boto3 is slow to import, so defer it until a client is needed.
+    # pylint: disable-next=import-outside-toplevel
+    import boto3
+
+    ecr_client = boto3.client("ecr", region_name=region)
+    auth_data = ecr_client.get_authorization_token()["authorizationData"][0]
+    # The token is a base64-encoded "AWS:<password>".
+    password = base64.b64decode(auth_data["authorizationToken"]).decode("utf-8").split(":", 1)[1]
+    subprocess.run(
+        ["docker", "login", "--username", "AWS", "--password-stdin", registry],
+        input=password,
+        text=True,
+        check=True,
+    )
+    _ecr_login_expiry[key] = auth_data["expiresAt"].timestamp()
+
 
 @register_bundler
 class ArtifactRegistryBundler(DockerBundler):
@@ -48,18 +89,13 @@ class ArtifactRegistryBundler(DockerBundler):
 
     def _build_and_push(self, *args, **kwargs):
         cfg = self.config
-        aws_region = aws_settings("aws_region", required=False)
-
-        cmd = f"aws ecr get-login-password " \
-              f"--region {aws_region} " \
-              f"| docker login --username AWS " \
-              f"--password-stdin {registry_from_repo(cfg.repo)}"
-        subprocess.run(cmd,
-            check=True,
-            shell=True
+        _ecr_login(
+            region=aws_settings("aws_region", required=False),
+            registry=registry_from_repo(cfg.repo),
         )
         return super()._build_and_push(*args, **kwargs)
 
+
 if __name__ == "__main__":
     common_flags()
     bundler_main_flags()
@@ -0,0 +1,61 @@
+# Copyright © 2024 Amazon Inc.
+
+"""Tests bundling utilities."""
+
+import base64
+import datetime
+from unittest import mock
+
+from absl.testing import parameterized
+
+from axlearn.cloud.aws import bundler
+
+
+def _auth_data(expires_in: datetime.timedelta) -> dict:
+    return {
+        "authorizationToken": base64.b64encode(b"AWS:test_password").decode("utf-8"),
+        "expiresAt": datetime.datetime.now(tz=datetime.timezone.utc) + expires_in,
+    }
+
+
+class EcrLoginTest(parameterized.TestCase):
+    """Tests ECR login."""
+
+    def setUp(self):
+        super().setUp()
+        bundler._ecr_login_expiry.clear()
+
+    def tearDown(self):
+        bundler._ecr_login_expiry.clear()
+        super().tearDown()
+
+    @parameterized.parameters(
+        # Token is still valid, so the second login is skipped.
+        dict(expires_in=datetime.timedelta(hours=12), expected_logins=1),
+        # Token is about to expire, so we log in again.
+        dict(expires_in=datetime.timedelta(minutes=1), expected_logins=2),
+    )
+    def test_ecr_login(self, expires_in, expected_logins):
+        mock_client = mock.MagicMock()
+        mock_client.get_authorization_token.return_value = {
+            "authorizationData": [_auth_data(expires_in)]
+        }
+        with mock.patch("boto3.client", return_value=mock_client) as mock_boto3, mock.patch(
+            f"{bundler.__name__}.subprocess.run"
+        ) as mock_run:
+            for _ in range(2):
+                bundler._ecr_login(region="us-west-2", registry="test.registry")
+
+            mock_boto3.assert_called_with("ecr", region_name="us-west-2")
+            self.assertEqual(expected_logins, mock_client.get_authorization_token.call_count)
+            self.assertEqual(expected_logins, mock_run.call_count)
+            mock_run.assert_called_with(
+                ["docker", "login", "--username", "AWS", "--password-stdin", "test.registry"],
+                input="test_password",
+                text=True,
+                check=True,
+            )
+
+            # A different registry requires a separate login.
+            bundler._ecr_login(region="us-west-2", registry="other.registry")
+            self.assertEqual(expected_logins + 1, mock_run.call_count)
@@ -53,7 +53,9 @@ def _flag_values() -> Dict[str, Any]:
 def aws_settings(
     key: str, *, default: Optional[Any] = None, required: bool = True
 ) -> Optional[str]:
-    """Reads a specific value from config file under the "GCP" namespace.
+    """Reads a specific value from config file under the "AWS" namespace.
+
+    Parsed config files are cached by `config.load_configs`, so repeated lookups are cheap.
 
     Args:
         key: The config field.
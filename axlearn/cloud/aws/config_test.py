@@ -0,0 +1,64 @@
+# Copyright © 2023 Apple Inc.
+
+"""Tests config utils."""
+
+import os
+import pathlib
+from unittest import mock
+
+import toml
+
+from axlearn.cloud.aws import config as aws_config
+from axlearn.cloud.common.config_test import _setup_fake_repo, create_default_config
+from axlearn.common.test_utils import TestWithTemporaryCWD, temp_chdir
+
+
+def _aws_contents(value) -> dict:
+    return {aws_config.CONFIG_NAMESPACE: {"test:test": {"key": value}}}
+
+
+class ConfigTest(TestWithTemporaryCWD):
+    """Tests config utils."""
+
+    @mock.patch(
+        f"{aws_config.__name__}._flag_values", return_value={"project": "test", "region": "test"}
+    )
+    def test_aws_settings_not_stale(self, flag_values):
+        del flag_values
+
+        temp_dir = pathlib.Path(os.path.realpath(self._temp_root.name))
+        repo_a, repo_b = temp_dir / "a", temp_dir / "b"
+        for repo, value in [(repo_a, "A"), (repo_b, "B")]:
+            repo.mkdir()
+            _setup_fake_repo(repo)
+            create_default_config(repo, contents=_aws_contents(value))
+
+        with temp_chdir(repo_a):
+            self.assertEqual("A", aws_config.aws_settings("key"))
+
+        # Changing the working directory should pick up a different config.
+        with temp_chdir(repo_b):
+            self.assertEqual("B", aws_config.aws_settings("key"))
+
+            # Modifying the config outside of the config utils should be picked up.
+            default_config = create_default_config(repo_b)
+            with open(default_config, "w", encoding="utf-8") as f:
+                toml.dump(_aws_contents("C"), f)
+            # Make sure the mtime changes even on file systems with coarse timestamps.
+            stat = os.stat(default_config)
+            os.utime(default_config, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertEqual("C", aws_config.aws_settings("key"))
+
+    @mock.patch(
+        f"{aws_config.__name__}._flag_values", return_value={"project": "test", "region": "test"}
+    )
+    def test_aws_settings_mutation(self, flag_values):
+        del flag_values
+
+        temp_dir = os.path.realpath(self._temp_root.name)
+        _setup_fake_repo(temp_dir)
+        create_default_config(temp_dir, contents=_aws_contents(["a"]))
+
+        # Mutating a returned value should not affect subsequent lookups.
+        aws_config.aws_settings("key").append("b")
+        self.assertEqual(["a"], aws_config.aws_settings("key"))
@@ -233,7 +233,6 @@ class CPUJob(AWSJob):
 
     def _execute(self) -> Any:
         """Performs some computation on remote VMs."""
-        print("running from here")
         cfg: CPUJob.Config = self.config
         self._execute_remote_cmd(cfg.command)
 
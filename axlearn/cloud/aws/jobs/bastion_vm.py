@@ -111,7 +111,7 @@ import shlex
 import subprocess
 import tempfile
 import time
-from typing import Sequence
+from typing import Optional, Sequence
 
 from absl import app, flags, logging
 from tensorflow import io as tf_io
@@ -133,7 +133,7 @@ from axlearn.cloud.aws.config import aws_settings
 from axlearn.cloud.aws.job import CPUJob, docker_command
 from axlearn.cloud.gcp.tpu_cleaner import TPUCleaner
 from axlearn.cloud.aws.utils import catch_auth, common_flags
-from axlearn.cloud.aws.vm import create_vm, delete_vm, get_vm_node
+from axlearn.cloud.aws.vm import create_vm, delete_vm, get_vm_node, get_vm_node_status
 from axlearn.common.config import REQUIRED, Required, config_class, config_for_function
 
 _SHARED_BASTION_SUFFIX = "shared-bastion"
@@ -271,9 +271,7 @@ class CreateBastionJob(CPUJob):
 
     def _delete(self):
         cfg = self.config
-        print("delete: ", cfg.name)
-
-        #delete_vm(cfg.name, credentials=self._get_job_credentials())
+        delete_vm(cfg.name, region=cfg.region)
 
     def _execute(self):
         cfg: CreateBastionJob.Config = self.config
@@ -288,7 +286,7 @@ class CreateBastionJob(CPUJob):
             iam_role_name=cfg.iam_role_name,
             bundler_type=self._bundler.TYPE,
         )
-        print(vm_id)
+        logging.debug("Bastion %s is running as %s.", cfg.name, vm_id)
 
         # Bastion outputs will be piped to run_log.
         run_log = os.path.join(output_dir(cfg.name), "logs", f"{cfg.name}-%Y%m%d")
@@ -340,10 +338,17 @@ class SubmitBastionJob(BaseSubmitBastionJob):
     - Emits a warning if the bastion doesn't exist in GCE.
     """
 
+    @config_class
+    class Config(BaseSubmitBastionJob.Config):
+        """Configures SubmitBastionJob."""
+
+        # AWS region of the bastion. If None, uses the default region.
+        region: Optional[str] = None
+
     def _execute(self):
         cfg: SubmitBastionJob.Config = self.config
-        node = get_vm_node(cfg.name)
-        if node is None or node.get("status", None) != "RUNNING":
+        node = get_vm_node(cfg.name, region=cfg.region)
+        if node is None or get_vm_node_status(node) != "running":
             logging.warning(
                 "Bastion %s does not appear to be running yet. "
                 "It will need to be running before jobs will execute.",
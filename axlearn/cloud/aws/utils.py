@@ -1,23 +1,28 @@
 # Copyright © 2023 Apple Inc.
 
-"""GCP general-purpose utilities."""
+"""AWS general-purpose utilities."""
 
 import functools
+import http.client
 import re
-import subprocess
 import sys
+import urllib.request
 from typing import Optional, Sequence
 
-import google.auth
-import boto3
-from botocore.exceptions import NoCredentialsError
+import botocore.exceptions
 from absl import flags, logging
-from google.auth import exceptions as gauthexceptions
-from google.auth import impersonated_credentials
-from google.auth.credentials import Credentials
 
 from axlearn.cloud.common.utils import infer_cli_name
-from axlearn.cloud.gcp.scopes import DEFAULT_APPLICATION
+
+# Timeout for requests to the metadata server. Off-VM, the host typically fails to resolve quickly,
+# but some networks instead drop the request.
+_METADATA_TIMEOUT_S = 1
+# Valid resource names. See `is_valid_resource_name`.
+_RESOURCE_NAME_RE = re.compile(r"[a-z](?:[-a-z0-9]*[a-z0-9])?")
+# Error codes indicating missing or expired AWS credentials. See `catch_auth`.
+_AUTH_ERROR_CODES = frozenset(
+    ["AuthFailure", "ExpiredToken", "ExpiredTokenException", "InvalidClientTokenId"]
+)
 
 
 def common_flags(**kwargs):
@@ -30,19 +35,23 @@ def common_flags(**kwargs):
     flags.DEFINE_string("iam_role_name", None, "The role with SSM access polity.", **kwargs)
 
 
+@functools.lru_cache(maxsize=1)
 def running_from_vm() -> bool:
     """Check if we're running from GCP VM.
 
+    The result is cached, since it cannot change over the lifetime of the process.
+
     Reference:
     https://cloud.google.com/compute/docs/instances/detect-compute-engine#use_the_metadata_server_to_detect_if_a_vm_is_running_in
     """
-    out = subprocess.run(
-        ["curl", "-s", "metadata.google.internal", "-i"],  # Curl silently.
-        check=False,
-        capture_output=True,
-        text=True,
+    request = urllib.request.Request(
+        "http://metadata.google.internal", headers={"Metadata-Flavor": "Google"}
     )
-    return (out.returncode == 0) and "Metadata-Flavor: Google" in out.stdout
+    try:
+        with urllib.request.urlopen(request, timeout=_METADATA_TIMEOUT_S) as response:
+            return response.headers.get("Metadata-Flavor", None) == "Google"
+    except (http.client.HTTPException, OSError):
+        return False
 
 
 def is_valid_resource_name(name: Optional[str]) -> bool:
@@ -51,7 +60,7 @@ def is_valid_resource_name(name: Optional[str]) -> bool:
     Reference:
     https://cloud.google.com/compute/docs/naming-resources#resource-name-format
     """
-    return name is not None and re.fullmatch(r"^[a-z]([-a-z0-9]*[a-z0-9])?", name) is not None
+    return name is not None and _RESOURCE_NAME_RE.fullmatch(name) is not None
 
 
 def catch_auth(fn):
@@ -61,8 +70,13 @@ def catch_auth(fn):
     def wrapped(*args, **kwargs):
         try:
             fn(*args, **kwargs)
-        except gauthexceptions.RefreshError:
-            logging.error("Please run `%s gcp auth`.", infer_cli_name())
+        except (botocore.exceptions.NoCredentialsError, botocore.exceptions.ClientError) as e:
+            if (
+                isinstance(e, botocore.exceptions.ClientError)
+                and e.response["Error"]["Code"] not in _AUTH_ERROR_CODES
+            ):
+                raise
+            logging.error("Please run `%s aws auth`.", infer_cli_name())
             sys.exit(1)
 
     return wrapped
@@ -0,0 +1,86 @@
+# Copyright © 2023 Apple Inc.
+
+"""Tests general AWS utils."""
+
+import http.client
+from typing import Dict, Optional
+from unittest import mock
+
+import botocore.exceptions
+from absl.testing import parameterized
+
+from axlearn.cloud.aws import utils
+
+
+def _mock_urlopen(headers: Optional[Dict[str, str]] = None, error: Optional[Exception] = None):
+    response = mock.MagicMock()
+    response.__enter__.return_value.headers = headers or {}
+    return mock.patch(
+        f"{utils.__name__}.urllib.request.urlopen",
+        return_value=response,
+        side_effect=error,
+    )
+
+
+def _client_error(code: str) -> botocore.exceptions.ClientError:
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code, "Message": "test"}}, "test_operation"
+    )
+
+
+class UtilsTest(parameterized.TestCase):
+    """Tests utils."""
+
+    def setUp(self):
+        super().setUp()
+        utils.running_from_vm.cache_clear()
+
+    def tearDown(self):
+        utils.running_from_vm.cache_clear()
+        super().tearDown()
+
+    @parameterized.parameters(
+        dict(name="test--01-exp123", expected=True),
+        dict(name="a", expected=True),
+        dict(name=None, expected=False),
+        dict(name="123-test", expected=False),  # Must begin with letter.
+        dict(name="test-", expected=False),  # Must not end with hyphen.
+        dict(name="test+123", expected=False),  # No other special characters allowed.
+    )
+    def test_is_valid_resource_name(self, name: Optional[str], expected: bool):
+        self.assertEqual(expected, utils.is_valid_resource_name(name))
+
+    @parameterized.parameters(
+        dict(headers={"Metadata-Flavor": "Google"}, error=None, expected=True),
+        dict(headers={}, error=None, expected=False),
+        dict(headers=None, error=TimeoutError("timed out"), expected=False),
+        dict(headers=None, error=http.client.BadStatusLine(""), expected=False),
+    )
+    def test_running_from_vm(self, headers, error, expected):
+        with _mock_urlopen(headers=headers, error=error) as mock_urlopen:
+            self.assertEqual(expected, utils.running_from_vm())
+            # The result should be cached.
+            self.assertEqual(expected, utils.running_from_vm())
+            self.assertEqual(1, mock_urlopen.call_count)
+            request = mock_urlopen.call_args[0][0]
+            self.assertEqual("Google", request.get_header("Metadata-flavor"))
+
+    @parameterized.parameters(
+        dict(error=None, expected_exit=False),
+        dict(error=botocore.exceptions.NoCredentialsError(), expected_exit=True),
+        dict(error=_client_error("ExpiredToken"), expected_exit=True),
+        dict(error=_client_error("InvalidAMIID.NotFound"), expected_exit=False),
+    )
+    def test_catch_auth(self, error, expected_exit):
+        fn = mock.Mock(side_effect=error)
+        wrapped = utils.catch_auth(fn)
+        if expected_exit:
+            with self.assertRaises(SystemExit):
+                wrapped()
+        elif error is not None:
+            # Other errors should be propagated.
+            with self.assertRaises(type(error)):
+                wrapped()
+        else:
+            wrapped()
+        fn.assert_called_once()
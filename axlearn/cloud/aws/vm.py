@@ -2,19 +2,103 @@
 
 """Utilities to create, delete, and list VMs."""
 
-import dataclasses
-import pathlib
+import asyncio
+import copy
+import functools
+import random
+import threading
 import time
+import uuid
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import botocore.exceptions
 from absl import logging
-import boto3
-import botocore
-from axlearn.cloud.common.docker import registry_from_repo
-from axlearn.cloud.common.utils import format_table
-from axlearn.cloud.gcp.config import gcp_settings
-from axlearn.cloud.gcp.utils import infer_cli_name, is_valid_resource_name
+
+from axlearn.cloud.aws.utils import is_valid_resource_name
+
+# Name of the security group assigned to VMs.
+_SECURITY_GROUP_NAME = "axlearn-security-group"
+# Tag shared by all VMs launched by the same request, so that they can be found before they are
+# tagged with their names.
+_BATCH_TAG_KEY = "axlearn-batch-id"
+# Polling interval and max attempts of waiters on VMs, i.e., wait for up to 10 minutes. This matches
+# the default timeout of the `instance_status_ok` waiter, but detects changes 10s sooner on average.
+_WAITER_DELAY_S = 5
+_WAITER_MAX_ATTEMPTS = 120
+# Retry config of EC2 clients. Adaptive mode retries throttling and transient errors within
+# botocore, rate limiting all calls made through the same client.
+_EC2_RETRIES = {"max_attempts": 10, "mode": "adaptive"}
+# Sustained rate and burst size of EC2 requests issued by this process, per region. Requests are
+# throttled proactively by `_TokenBucket`, rather than waiting for EC2 to throttle them.
+_EC2_REQUESTS_PER_S = 5.0
+_EC2_REQUEST_BURST = 10
+# Errors of `run_instances` that are retried by `create_vm`, e.g. since capacity may free up later.
+# Throttling errors are normally retried by botocore, so they only reach `create_vm` once botocore's
+# retries are exhausted, in which case we back off for longer.
+_THROTTLING_ERROR_CODES = frozenset(["RequestLimitExceeded", "Throttling", "ThrottlingException"])
+_RETRYABLE_ERROR_CODES = (
+    frozenset(["InsufficientInstanceCapacity", "InternalError"]) | _THROTTLING_ERROR_CODES
+)
+# Maximum number of attempts to create a VM on retryable errors, before giving up.
+_MAX_ATTEMPTS = 8
+# Bounds of the backoff between attempts to create a VM. See `_next_backoff`.
+_BACKOFF_BASE_S = 1.0
+_BACKOFF_CAP_S = 512.0
+# How long `describe_instances` results are reused by `get_vm_nodes`.
+_DESCRIBE_CACHE_TTL_S = 5
+# Maximum number of distinct `describe_instances` results kept by `get_vm_nodes`.
+_DESCRIBE_CACHE_MAX_SIZE = 128
+# Maximum number of values of a `describe_instances` filter.
+_DESCRIBE_FILTER_MAX_VALUES = 200
+# Page size of `describe_instances` requests.
+_DESCRIBE_PAGE_SIZE = 100
+# Maps (region, names) to (time of describe, nodes).
+_describe_cache: Dict[Tuple[Optional[str], Tuple[str, ...]], Tuple[float, Dict[str, Any]]] = {}
+
+
+class _TokenBucket:
+    """A thread-safe token bucket rate limiter."""
+
+    def __init__(self, *, rate: float, capacity: int):
+        """Initializes the bucket.
+
+        Args:
+            rate: Tokens added per second, i.e., the sustained rate of `acquire` calls.
+            capacity: Maximum number of tokens, i.e., the burst size.
+        """
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._timestamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token, possibly in the future.
+
+        Returns:
+            The seconds to wait before the token is available, or a non-positive value if it
+            is available now.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._timestamp) * self._rate)
+            self._timestamp = now
+            # Reserve a token, possibly in the future, so that concurrent callers wait in turn.
+            self._tokens -= 1
+            return -self._tokens / self._rate
+
+    def acquire(self):
+        """Takes a token, blocking until one is available."""
+        wait_for = self.reserve()
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+    async def aacquire(self):
+        """An async variant of `acquire`, which doesn't block the event loop."""
+        wait_for = self.reserve()
+        if wait_for > 0:
+            await asyncio.sleep(wait_for)
 
 
 class VMCreationError(RuntimeError):
@@ -62,113 +146,294 @@ def create_vm(
     """
     if not is_valid_resource_name(name):
         raise ValueError(f"{name} is not a valid resource name.")
+    node = get_vm_node(name, region=region)
+    if node is not None and get_vm_node_status(node) != "terminated":  # VM exists.
+        status = get_vm_node_status(node)
+        vm_id = get_vm_node_id(node)
+        if status == "running":
+            logging.info("VM %s %s is RUNNING", name, vm_id)
+            return vm_id
+        ec2_client = _ec2_client(region)
+        waiter_config = {"Delay": _WAITER_DELAY_S, "MaxAttempts": _WAITER_MAX_ATTEMPTS}
+        target = "TERMINATED" if status == "shutting-down" else "RUNNING"
+        try:
+            if target == "RUNNING":
+                if status == "stopping":
+                    logging.info("VM %s is stopping, waiting for STOPPED.", name)
+                    ec2_client.get_waiter("instance_stopped").wait(
+                        InstanceIds=[vm_id], WaiterConfig=waiter_config
+                    )
+                if status in ("stopping", "stopped"):
+                    # A stopped VM doesn't become running on its own.
+                    logging.info("Starting VM %s %s.", name, vm_id)
+                    _rate_limiter(region).acquire()
+                    ec2_client.start_instances(InstanceIds=[vm_id])
+                    _describe_cache.clear()
+                logging.info("VM %s showing %s, waiting for RUNNING.", name, status)
+                ec2_client.get_waiter("instance_running").wait(
+                    InstanceIds=[vm_id], WaiterConfig=waiter_config
+                )
+                logging.info("VM %s %s is RUNNING", name, vm_id)
+                return vm_id
+            # The VM will not come back up, so wait for it to terminate and recreate it below.
+            logging.info("VM %s is shutting down, waiting for TERMINATED.", name)
+            ec2_client.get_waiter("instance_terminated").wait(
+                InstanceIds=[vm_id], WaiterConfig=waiter_config
+            )
+            _describe_cache.clear()
+        except (botocore.exceptions.ClientError, botocore.exceptions.WaiterError) as e:
+            raise VMCreationError(f"VM {name} {vm_id} did not become {target}.") from e
+
+    # VM doesn't exist.
+    return _launch_vms(
+        [name],
+        region=region,
+        ami_id=ami_id,
+        instance_type=instance_type,
+        key_pair_name=key_pair_name,
+        volume_size=volume_size,
+        iam_role_name=iam_role_name,
+    )[0]
+
+
+def create_vms(
+    names: Sequence[str],
+    *,
+    region: str,
+    ami_id: str,
+    instance_type: str,
+    key_pair_name: str,
+    volume_size: int,
+    iam_role_name: str,
+    bundler_type: str,
+    metadata: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    """Create multiple VMs with the same configuration.
+
+    VMs which do not exist are launched with a single `run_instances` request, and waited on
+    together. Existing VMs are handled as in `create_vm`.
+
+    Args:
+        names: Names of VMs.
+        region: AWS region.
+        ami_id: Type of image intended to be loaded to VMs.
+        instance_type: What ec2 machine type to boot.
+        key_pair_name: The security key pair used for VMs (used for SSH).
+        volume_size: Size of disk to provision (in GB).
+        iam_role_name: The IAM role attached to VMs.
+        bundler_type: Type of bundle intended to be loaded to VMs.
+        metadata: Optional metadata for the instances.
+
+    Returns:
+        The instance ids, in the same order as `names`.
+
+    Raises:
+        VMCreationError: If an exeption is raised on the creation request.
+        ValueError: If an invalid or duplicate name is provided.
+    """
+    for name in names:
+        if not is_valid_resource_name(name):
+            raise ValueError(f"{name} is not a valid resource name.")
+    if len(set(names)) != len(names):
+        raise ValueError(f"Names must be unique, got {names}.")
+    nodes = get_vm_nodes(names, region=region)
+    new_names = [
+        name
+        for name in names
+        if name not in nodes or get_vm_node_status(nodes[name]) == "terminated"
+    ]
+    kwargs = dict(
+        region=region,
+        ami_id=ami_id,
+        instance_type=instance_type,
+        key_pair_name=key_pair_name,
+        volume_size=volume_size,
+        iam_role_name=iam_role_name,
+    )
+    vm_ids = dict(zip(new_names, _launch_vms(new_names, **kwargs))) if new_names else {}
+    for name in names:
+        if name not in vm_ids:
+            vm_ids[name] = create_vm(name, **kwargs, bundler_type=bundler_type, metadata=metadata)
+    return [vm_ids[name] for name in names]
+
+
+def _launch_vms(
+    names: Sequence[str],
+    *,
+    region: str,
+    ami_id: str,
+    instance_type: str,
+    key_pair_name: str,
+    volume_size: int,
+    iam_role_name: str,
+) -> List[str]:
+    """Launches one VM per name with a single `run_instances` request.
+
+    Retryable errors (see `_RETRYABLE_ERROR_CODES`) are retried with backoff, up to `_MAX_ATTEMPTS`
+    attempts in total.
+
+    Returns:
+        The instance ids, in the same order as `names`.
+
+    Raises:
+        VMCreationError: If the VMs do not pass status checks, or retryable errors persist.
+        botocore.exceptions.ClientError: If a non-retryable error is raised by EC2.
+    """
+    # The security group and instance params are resolved once, outside of the retry loop.
+    ec2_client = _ec2_client(region)
+    batch_id = uuid.uuid4().hex if len(names) > 1 else None
+    instance_params = _vm_config(
+        # A launch applies the same tags to all instances, so batches are named below.
+        names[0] if len(names) == 1 else None,
+        ami_id=ami_id,
+        instance_type=instance_type,
+        key_pair_name=key_pair_name,
+        volume_size=volume_size,
+        iam_role_name=iam_role_name,
+        security_group=_ensure_security_group(region),
+        count=len(names),
+        batch_id=batch_id,
+    )
     attempt = 0
+    backoff_for = _BACKOFF_BASE_S
+    refreshed_security_group = False
     while True:
-        node = get_vm_node(name)
-        if node is None or (
-            node is not None and get_vm_node_status(node) == "terminated"
-        ):  # VM doesn't exist.
-            if attempt:
-                # Exponential backoff capped at 512s.
-                backoff_for = 2 ** min(attempt, 9)
-                logging.info(
-                    "Attempt %d to create VM failed, backoff for %ds. ",
-                    attempt,
-                    backoff_for,
-                    aws_settings("project"),
-                )
-                time.sleep(backoff_for)
+        if attempt:
+            backoff_for = _next_backoff(backoff_for)
+            logging.info("Attempt %d to create VM failed, backoff for %.1fs.", attempt, backoff_for)
+            time.sleep(backoff_for)
+
+        try:
+            _rate_limiter(region).acquire()
+            instances = ec2_client.run_instances(**instance_params)
+            break
+        except botocore.exceptions.ClientError as err:
+            if _check_launch_error(
+                err,
+                names=names,
+                attempt=attempt,
+                refreshed_security_group=refreshed_security_group,
+                instance_params=instance_params,
+            ):
+                _refresh_security_group(region, instance_params)
+                refreshed_security_group = True
+            else:
+                attempt += 1
 
-            try:
-                # create security group first
-                ec2_client = boto3.client("ec2", region_name=region)
+    # Cached VM info is now stale.
+    _describe_cache.clear()
+    instance_ids = [instance["InstanceId"] for instance in instances["Instances"]]
+    if len(names) > 1:
+        _tag_vms(names, instance_ids, region=region, batch_id=batch_id)
+    try:
+        # A single waiter polls the status of all instances together.
+        ec2_client.get_waiter("instance_status_ok").wait(
+            InstanceIds=instance_ids,
+            WaiterConfig={"Delay": _WAITER_DELAY_S, "MaxAttempts": _WAITER_MAX_ATTEMPTS},
+        )
+    except botocore.exceptions.WaiterError as e:
+        raise VMCreationError(f"VMs {names} {instance_ids} did not pass status checks.") from e
+    # The new instances are known to be up, so return without describing them again.
+    return instance_ids
 
-                security_groups_name = [
-                    g["GroupName"] for g in ec2_client.describe_security_groups()["SecurityGroups"]
-                ]
 
-                if "axlearn-security-group" in security_groups_name:
-                    security_group = ec2_client.describe_security_groups(
-                        GroupNames=["axlearn-security-group"]
-                    )["SecurityGroups"][0]
-                else:
-                    security_group = ec2_client.create_security_group(
-                        GroupName="axlearn-security-group",
-                        Description="The security group for axlearn",
-                    )
+def _check_launch_error(
+    err: botocore.exceptions.ClientError,
+    *,
+    names: Sequence[str],
+    attempt: int,
+    refreshed_security_group: bool,
+    instance_params: Dict[str, Any],
+) -> bool:
+    """Classifies an error raised by `run_instances`, for `_launch_vms` and `acreate_vm`.
 
-                    ec2_client.authorize_security_group_ingress(
-                        GroupId=security_group["GroupId"],
-                        IpPermissions=[
-                            {
-                                "IpProtocol": "tcp",
-                                "FromPort": 80,
-                                "ToPort": 80,
-                                "IpRanges": [
-                                    {"CidrIp": "0.0.0.0/0"}
-                                ],  # Allow inbound traffic on port 80 from all IP addresses
-                            },
-                            {
-                                "IpProtocol": "tcp",
-                                "FromPort": 22,
-                                "ToPort": 22,
-                                "IpRanges": [
-                                    {"CidrIp": "0.0.0.0/0"}
-                                ],  # Allow SSH access on port 22 from all IP addresses
-                            },
-                        ],
-                    )
+    Args:
+        err: The error.
+        names: Names of the VMs being launched.
+        attempt: Number of attempts that failed with retryable errors before this one.
+        refreshed_security_group: Whether the security group has already been resolved again.
+        instance_params: The `run_instances` params.
 
-                # create ec2 instance
-                #ec2_resource = boto3.resource("ec2", region_name=region)
-
-                instance_params = _vm_config(
-                    name,
-                    ami_id=ami_id,
-                    instance_type=instance_type,
-                    key_pair_name=key_pair_name,
-                    volume_size=volume_size,
-                    iam_role_name=iam_role_name,
-                    security_group=security_group,
-                )
+    Returns:
+        True if the security group should be resolved again (see `_refresh_security_group`)
+        before retrying, or False if the launch should be retried after backoff.
 
-                instances = ec2_client.run_instances(**instance_params)
-                instance_id = instances['Instances'][0]['InstanceId']
+    Raises:
+        VMCreationError: If retryable errors persist after `_MAX_ATTEMPTS` attempts.
+        botocore.exceptions.ClientError: If the error is not retryable.
+    """
+    code = err.response["Error"]["Code"]
+    if code == "InvalidGroup.NotFound" and not refreshed_security_group:
+        return True
+    if code in _RETRYABLE_ERROR_CODES:
+        if attempt + 1 >= _MAX_ATTEMPTS:
+            raise VMCreationError(
+                f"Failed to create VMs {names} after {attempt + 1} attempts."
+            ) from err
+        return False
+    logging.error(
+        "Couldn't create instance with image %s, instance type %s, and key %s. "
+        "Here's why: %s: %s",
+        instance_params["ImageId"],
+        instance_params["InstanceType"],
+        instance_params["KeyName"],
+        code,
+        err.response["Error"]["Message"],
+    )
+    raise err
+
+
+def _refresh_security_group(region: Optional[str], instance_params: Dict[str, Any]):
+    """Resolves the security group again after the cached one has been deleted.
 
-                #instances = ec2_resource.create_instances(**instance_params)[0]
-                #instances.wait_until_running()
+    Args:
+        region: AWS region. If None, uses the default region.
+        instance_params: The `run_instances` params, updated in place with the new security group.
+    """
+    _ensure_security_group.cache_clear()
+    instance_params["SecurityGroupIds"] = [_ensure_security_group(region)["GroupId"]]
 
-                waiter = ec2_client.get_waiter("instance_status_ok")
-                waiter.wait(InstanceIds=[instance_id])
 
-                attempt += 1
-            except botocore.exceptions.ClientError as err:
-                logging.error(
-                    "Couldn't create instance with image %s, instance type %s, and key %s. "
-                    "Here's why: %s: %s",
-                    ami_id,
-                    instance_type,
-                    key_pair_name,
-                    err.response["Error"]["Code"],
-                    err.response["Error"]["Message"],
-                )
-                raise err
+def _tag_vms(names: Sequence[str], instance_ids: Sequence[str], *, region: str, batch_id: str):
+    """Tags each instance of a batch with its name.
 
-            return instance_id
+    Untagged instances cannot be found by name, so if tagging fails, the batch is terminated.
 
-        else:  # VM exists.
-            status = get_vm_node_status(node)
-            vm_id = get_vm_node_id(node)
-            if status == "running":
-                logging.info(
-                    "VM %s %s is RUNNING",
-                    name,
-                    vm_id,
-                )
-                return vm_id 
-            else:
-                logging.info("VM %s showing %s, waiting for RUNNING.", name, status)
-            time.sleep(10)
+    Raises:
+        VMCreationError: If tagging fails.
+    """
+    ec2_client = _ec2_client(region)
+    try:
+        for name, instance_id in zip(names, instance_ids):
+            _rate_limiter(region).acquire()
+            ec2_client.create_tags(Resources=[instance_id], Tags=[{"Key": "Name", "Value": name}])
+    except botocore.exceptions.ClientError as err:
+        try:
+            _rate_limiter(region).acquire()
+            ec2_client.terminate_instances(InstanceIds=list(instance_ids))
+        except botocore.exceptions.ClientError as terminate_err:
+            logging.error(
+                "Failed to terminate untagged VMs %s (tag %s=%s): %s",
+                instance_ids,
+                _BATCH_TAG_KEY,
+                batch_id,
+                terminate_err,
+            )
+        raise VMCreationError(
+            f"Failed to tag VMs {names} {instance_ids} (tag {_BATCH_TAG_KEY}={batch_id})."
+        ) from err
+
+
+def _next_backoff(prev: float) -> float:
+    """Returns the next backoff with "decorrelated jitter", given the previous one.
+
+    Randomizing each backoff based on the previous one avoids synchronized retries across concurrent
+    callers, while growing the backoff roughly exponentially.
+
+    Reference:
+    https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    """
+    return min(_BACKOFF_CAP_S, random.uniform(_BACKOFF_BASE_S, prev * 3))
 
 
 def get_vm_node_id(node: Dict[str, Any]) -> str:
@@ -193,46 +458,53 @@ def get_vm_node_status(node: Dict[str, Any]) -> str:
     return node["Instances"][0]["State"]["Name"]
 
 
-def delete_vm(name: str):
+def delete_vm(name: str, *, region: Optional[str] = None):
     """Delete VM.
 
     Args:
         name: Name of VM to delete.
+        region: AWS region. If None, uses the default region.
 
     Raises:
         VMDeletionError: If an exeption is raised on the deletion request.
     """
-    print("delete")
-    exit()
-    node = get_vm_node(name)
-    if node is None:  # VM doesn't exist.
-        logging.info("VM %s doesn't exist.", name)
+    delete_vms([name], region=region)
+
+
+def delete_vms(names: Sequence[str], *, region: Optional[str] = None):
+    """Delete multiple VMs with a single `terminate_instances` request.
+
+    Args:
+        names: Names of VMs to delete. VMs which don't exist are skipped.
+        region: AWS region. If None, uses the default region.
+
+    Raises:
+        VMDeletionError: If an exeption is raised on the deletion request.
+    """
+    nodes = get_vm_nodes(names, region=region)
+    vm_ids = {}
+    for name in names:
+        node = nodes.get(name, None)
+        if node is None or get_vm_node_status(node) == "terminated":  # VM doesn't exist.
+            logging.info("VM %s doesn't exist.", name)
+        else:
+            vm_ids[name] = get_vm_node_id(node)
+    if not vm_ids:
         return
+    ec2_client = _ec2_client(region)
     try:
-        response = (
-            resource.instances()
-            .delete(project=gcp_settings("project"), zone=gcp_settings("zone"), instance=name)
-            .execute()
+        ec2_client.terminate_instances(InstanceIds=list(vm_ids.values()))
+        # Cached VM info is now stale.
+        _describe_cache.clear()
+        logging.info("Waiting for deletion of VMs %s to complete.", vm_ids)
+        # A single waiter polls the status of all instances together.
+        ec2_client.get_waiter("instance_terminated").wait(
+            InstanceIds=list(vm_ids.values()),
+            WaiterConfig={"Delay": _WAITER_DELAY_S, "MaxAttempts": _WAITER_MAX_ATTEMPTS},
         )
-        while True:
-            logging.info("Waiting for deletion of VM %s to complete.", name)
-            zone_op = (
-                resource.zoneOperations()
-                .get(
-                    project=gcp_settings("project"),
-                    zone=gcp_settings("zone"),
-                    operation=response["name"],
-                )
-                .execute()
-            )
-            if zone_op.get("status") == "DONE":
-                if "error" in zone_op:
-                    raise VMDeletionError(zone_op["error"])
-                logging.info("Deletion of VM %s is complete.", name)
-                return
-            time.sleep(10)
-    except (errors.HttpError, Exception) as e:
-        raise VMDeletionError("Failed to delete VM") from e
+        logging.info("Deletion of VMs %s is complete.", list(vm_ids))
+    except (botocore.exceptions.ClientError, botocore.exceptions.WaiterError) as e:
+        raise VMDeletionError(f"Failed to delete VMs {vm_ids}") from e
 
 
 @dataclass
@@ -244,7 +516,7 @@ class VmInfo:
 
 
 def _vm_config(
-    name: str,
+    name: Optional[str],
     *,
     ami_id: str,
     instance_type: str,
@@ -252,14 +524,20 @@ def _vm_config(
     volume_size: int,
     iam_role_name: str,
     security_group: Dict,
+    count: int = 1,
+    batch_id: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """Returns `run_instances` params to launch `count` VMs.
+
+    The VMs are named `name` unless None, and tagged with `batch_id` unless None.
+    """
     instance_params = {
-        "ImageId": f"{ami_id}",
-        "InstanceType": f"{instance_type}",
-        "KeyName": f"{key_pair_name}",
+        "ImageId": ami_id,
+        "InstanceType": instance_type,
+        "KeyName": key_pair_name,
         "SecurityGroupIds": [security_group["GroupId"]],
-        "MinCount": 1,
-        "MaxCount": 1,
+        "MinCount": count,
+        "MaxCount": count,
         "BlockDeviceMappings": [
             {
                 "DeviceName": "/dev/sda1",
@@ -269,25 +547,381 @@ def _vm_config(
                 },
             }
         ],
-        "TagSpecifications": [
-            {"ResourceType": "instance", "Tags": [{"Key": "Name", "Value": f"{name}"}]}
-        ],
         "IamInstanceProfile": {"Name": iam_role_name},
     }
+    tags = []
+    if name is not None:
+        tags.append({"Key": "Name", "Value": name})
+    if batch_id is not None:
+        tags.append({"Key": _BATCH_TAG_KEY, "Value": batch_id})
+    if tags:
+        instance_params["TagSpecifications"] = [{"ResourceType": "instance", "Tags": tags}]
 
     return instance_params
 
 
-def get_vm_node(name: str) -> Optional[Dict[str, Any]]:
+@functools.lru_cache(maxsize=None)
+def _ec2_client(region: Optional[str] = None) -> "botocore.client.BaseClient":
+    """Returns an EC2 client for the given region.
+
+    Clients are cached, as constructing one loads the service model and resolves credentials.
+    """
+    # boto3 is slow to import, so defer it until a client is needed.
+    # pylint: disable-next=import-outside-toplevel
+    import boto3
+
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.config import Config
+
+    return boto3.client("ec2", region_name=region, config=Config(retries=_EC2_RETRIES))
+
+
+@functools.lru_cache(maxsize=None)
+def _rate_limiter(region: Optional[str] = None) -> _TokenBucket:
+    """Returns the rate limiter of EC2 requests to the given region."""
+    # The region only keys the cache, so that each region is limited separately.
+    del region
+    return _TokenBucket(rate=_EC2_REQUESTS_PER_S, capacity=_EC2_REQUEST_BURST)
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_security_group(region: Optional[str] = None) -> Dict[str, Any]:
+    """Gets the axlearn security group, creating it if it doesn't exist.
+
+    The result is cached, so the security group is looked up at most once per region. Call
+    `_ensure_security_group.cache_clear()` if the security group may have been deleted.
+
+    Args:
+        region: AWS region. If None, uses the default region.
+
+    Returns:
+        A dict containing the "GroupId" of the security group.
+
+    Raises:
+        VMCreationError: If the region has no default VPC.
+        botocore.exceptions.ClientError: If the security group could not be described or created.
+    """
+    ec2_client = _ec2_client(region)
+    # VMs are launched into the default VPC, so the security group must belong to it.
+    _rate_limiter(region).acquire()
+    vpcs = ec2_client.describe_vpcs(Filters=[{"Name": "is-default", "Values": ["true"]}])["Vpcs"]
+    if not vpcs:
+        raise VMCreationError(f"No default VPC in region {region}.")
+    vpc_id = vpcs[0]["VpcId"]
+
+    _rate_limiter(region).acquire()
+    # Unlike `GroupNames`, a filter returns an empty list rather than raising if the group doesn't
+    # exist. Groups with the same name may exist in other VPCs, so filter by VPC as well.
+    security_groups = ec2_client.describe_security_groups(
+        Filters=[
+            {"Name": "group-name", "Values": [_SECURITY_GROUP_NAME]},
+            {"Name": "vpc-id", "Values": [vpc_id]},
+        ]
+    )["SecurityGroups"]
+    if security_groups:
+        return {"GroupId": security_groups[0]["GroupId"]}
+
+    security_group = ec2_client.create_security_group(
+        GroupName=_SECURITY_GROUP_NAME,
+        Description="The security group for axlearn",
+        VpcId=vpc_id,
+    )
+    ec2_client.authorize_security_group_ingress(
+        GroupId=security_group["GroupId"],
+        IpPermissions=[
+            {
+                "IpProtocol": "tcp",
+                "FromPort": 80,
+                "ToPort": 80,
+                "IpRanges": [
+                    {"CidrIp": "0.0.0.0/0"}
+                ],  # Allow inbound traffic on port 80 from all IP addresses
+            },
+            {
+                "IpProtocol": "tcp",
+                "FromPort": 22,
+                "ToPort": 22,
+                "IpRanges": [
+                    {"CidrIp": "0.0.0.0/0"}
+                ],  # Allow SSH access on port 22 from all IP addresses
+            },
+        ],
+    )
+    return {"GroupId": security_group["GroupId"]}
+
+
+def get_vm_nodes(
+    names: Sequence[str], *, region: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Gets information about multiple VM nodes with paginated `describe_instances` calls.
+
+    A single call describes up to `_DESCRIBE_FILTER_MAX_VALUES` names. Results are cached for
+    `_DESCRIBE_CACHE_TTL_S` seconds, so that repeated polling (e.g. of many VMs concurrently) does
+    not issue an API call per VM.
+
+    Args:
+        names: Names of EC2 VMs.
+        region: AWS region. If None, uses the default region.
+
+    Returns:
+        A mapping from name to VM node, for each of the VMs that exist. If there are multiple VMs
+        with the same name, non-terminated ones take precedence.
+    """
+    if not names:
+        return {}
+
+    # The cache may be updated concurrently by other threads, so entries are popped rather than
+    # deleted, and looked up with a single `get`.
+    now = time.monotonic()
+    for key, (timestamp, _) in list(_describe_cache.items()):
+        if now - timestamp >= _DESCRIBE_CACHE_TTL_S:
+            _describe_cache.pop(key, None)
+
+    key = (region, tuple(sorted(set(names))))
+    cached = _describe_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached[1])
+
+    paginator = _ec2_client(region).get_paginator("describe_instances")
+    reservations = []
+    for filters in _describe_filters(key[1]):
+        _rate_limiter(region).acquire()
+        for page in paginator.paginate(
+            Filters=filters, PaginationConfig={"PageSize": _DESCRIBE_PAGE_SIZE}
+        ):
+            reservations.extend(page["Reservations"])
+    nodes = _nodes_by_name(reservations)
+
+    if len(_describe_cache) >= _DESCRIBE_CACHE_MAX_SIZE:
+        # Evict the oldest entry. Dicts preserve insertion order.
+        _describe_cache.pop(next(iter(_describe_cache), None), None)
+    _describe_cache[key] = (now, nodes)
+    return copy.deepcopy(nodes)
+
+
+def _describe_filters(names: Sequence[str]) -> List[List[Dict[str, Any]]]:
+    """Returns `describe_instances` filters matching `names`, one per call.
+
+    EC2 limits the number of values of a filter, so names are split into chunks of at most
+    `_DESCRIBE_FILTER_MAX_VALUES`.
+    """
+    return [
+        [{"Name": "tag:Name", "Values": list(names[i : i + _DESCRIBE_FILTER_MAX_VALUES])}]
+        for i in range(0, len(names), _DESCRIBE_FILTER_MAX_VALUES)
+    ]
+
+
+def _nodes_by_name(reservations: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Maps VM names to nodes, given reservations as returned by `describe_instances`.
+
+    A reservation contains all instances launched by the same request (e.g. by `create_vms`), so
+    each instance is returned as a separate node containing only that instance.
+    """
+    nodes = {}
+    for reservation in reservations:
+        for instance in reservation["Instances"]:
+            node = {**reservation, "Instances": [instance]}
+            name = _get_vm_node_name(node)
+            # Prefer non-terminated VMs; otherwise, the last one takes precedence.
+            if (
+                name in nodes
+                and get_vm_node_status(node) == "terminated"
+                and get_vm_node_status(nodes[name]) != "terminated"
+            ):
+                continue
+            nodes[name] = node
+    return nodes
+
+
+def get_vm_node(name: str, *, region: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """Gets information about a VM node.
 
     Args:
         name: Name of EC2 VM.
+        region: AWS region. If None, uses the default region.
 
     Returns:
         The VM with the given name, or None if it doesn't exist.
     """
+    return get_vm_nodes([name], region=region).get(name, None)
+
+
+def _get_vm_node_name(node: Dict[str, Any]) -> Optional[str]:
+    """Returns the value of the "Name" tag of the given VM node, or None if it's not tagged."""
+    for tag in node["Instances"][0].get("Tags", []):
+        if tag["Key"] == "Name":
+            return tag["Value"]
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _aioboto3_session() -> "aioboto3.Session":
+    """Returns the aioboto3 session used by async VM utilities.
+
+    The session is created once, since creating it does synchronous work (e.g. loading data files)
+    which would otherwise block the event loop.
+    """
+    try:
+        # pylint: disable-next=import-outside-toplevel
+        import aioboto3
+    except ModuleNotFoundError as e:
+        raise ModuleNotFoundError(
+            "To use async VM utilities, please install aioboto3 with `pip install aioboto3`."
+        ) from e
+    return aioboto3.Session()
+
+
+def _aec2_client(region: Optional[str] = None):
+    """Returns an async EC2 client for the given region, to be used as an async context manager."""
+    # pylint: disable-next=import-outside-toplevel
+    from botocore.config import Config
+
+    return _aioboto3_session().client(
+        "ec2", region_name=region, config=Config(retries=_EC2_RETRIES)
+    )
+
+
+async def aget_vm_nodes(
+    names: Sequence[str], *, region: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """An async variant of `get_vm_nodes`. Results are not cached."""
+    if not names:
+        return {}
+    reservations = []
+    async with _aec2_client(region) as ec2:
+        paginator = ec2.get_paginator("describe_instances")
+        for filters in _describe_filters(sorted(set(names))):
+            await _rate_limiter(region).aacquire()
+            async for page in paginator.paginate(
+                Filters=filters, PaginationConfig={"PageSize": _DESCRIBE_PAGE_SIZE}
+            ):
+                reservations.extend(page["Reservations"])
+    return _nodes_by_name(reservations)
+
+
+async def aget_vm_node(name: str, *, region: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """An async variant of `get_vm_node`."""
+    return (await aget_vm_nodes([name], region=region)).get(name, None)
+
+
+async def acreate_vm(
+    name: str,
+    *,
+    region: str,
+    ami_id: str,
+    instance_type: str,
+    key_pair_name: str,
+    volume_size: int,
+    iam_role_name: str,
+    bundler_type: str,
+    metadata: Optional[Dict[str, str]] = None,
+) -> str:
+    """An async variant of `create_vm`, so that many VMs can be created concurrently."""
+    del bundler_type, metadata
+    if not is_valid_resource_name(name):
+        raise ValueError(f"{name} is not a valid resource name.")
+    waiter_config = {"Delay": _WAITER_DELAY_S, "MaxAttempts": _WAITER_MAX_ATTEMPTS}
+    node = await aget_vm_node(name, region=region)
+    async with _aec2_client(region) as ec2:
+        if node is not None and get_vm_node_status(node) != "terminated":  # VM exists.
+            status = get_vm_node_status(node)
+            vm_id = get_vm_node_id(node)
+            target = "TERMINATED" if status == "shutting-down" else "RUNNING"
+            try:
+                if target == "RUNNING":
+                    if status == "stopping":
+                        logging.info("VM %s is stopping, waiting for STOPPED.", name)
+                        await ec2.get_waiter("instance_stopped").wait(
+                            InstanceIds=[vm_id], WaiterConfig=waiter_config
+                        )
+                    if status in ("stopping", "stopped"):
+                        # A stopped VM doesn't become running on its own.
+                        logging.info("Starting VM %s %s.", name, vm_id)
+                        await _rate_limiter(region).aacquire()
+                        await ec2.start_instances(InstanceIds=[vm_id])
+                        _describe_cache.clear()
+                    if status != "running":
+                        logging.info("VM %s showing %s, waiting for RUNNING.", name, status)
+                        await ec2.get_waiter("instance_running").wait(
+                            InstanceIds=[vm_id], WaiterConfig=waiter_config
+                        )
+                    logging.info("VM %s %s is RUNNING", name, vm_id)
+                    return vm_id
+                logging.info("VM %s is shutting down, waiting for TERMINATED.", name)
+                await ec2.get_waiter("instance_terminated").wait(
+                    InstanceIds=[vm_id], WaiterConfig=waiter_config
+                )
+            except (botocore.exceptions.ClientError, botocore.exceptions.WaiterError) as e:
+                raise VMCreationError(f"VM {name} {vm_id} did not become {target}.") from e
+
+        # VM doesn't exist. The security group is cached, so it's resolved at most once per region.
+        security_group = await asyncio.to_thread(_ensure_security_group, region)
+        instance_params = _vm_config(
+            name,
+            ami_id=ami_id,
+            instance_type=instance_type,
+            key_pair_name=key_pair_name,
+            volume_size=volume_size,
+            iam_role_name=iam_role_name,
+            security_group=security_group,
+        )
+        attempt = 0
+        backoff_for = _BACKOFF_BASE_S
+        refreshed_security_group = False
+        while True:
+            if attempt:
+                backoff_for = _next_backoff(backoff_for)
+                logging.info(
+                    "Attempt %d to create VM failed, backoff for %.1fs.", attempt, backoff_for
+                )
+                await asyncio.sleep(backoff_for)
 
-    ec2 = boto3.client("ec2")
-    nodes = ec2.describe_instances(Filters=[{"Name": "tag:Name", "Values": [name]}])["Reservations"]
-    return None if not nodes else nodes.pop()
+            try:
+                await _rate_limiter(region).aacquire()
+                instances = await ec2.run_instances(**instance_params)
+                break
+            except botocore.exceptions.ClientError as err:
+                if _check_launch_error(
+                    err,
+                    names=[name],
+                    attempt=attempt,
+                    refreshed_security_group=refreshed_security_group,
+                    instance_params=instance_params,
+                ):
+                    await asyncio.to_thread(_refresh_security_group, region, instance_params)
+                    refreshed_security_group = True
+                else:
+                    attempt += 1
+        # Cached VM info is now stale.
+        _describe_cache.clear()
+        instance_id = instances["Instances"][0]["InstanceId"]
+        try:
+            await ec2.get_waiter("instance_status_ok").wait(
+                InstanceIds=[instance_id], WaiterConfig=waiter_config
+            )
+        except botocore.exceptions.WaiterError as e:
+            raise VMCreationError(f"VM {name} {instance_id} did not pass status checks.") from e
+        return instance_id
+
+
+async def adelete_vm(name: str, *, region: Optional[str] = None):
+    """An async variant of `delete_vm`."""
+    node = await aget_vm_node(name, region=region)
+    if node is None or get_vm_node_status(node) == "terminated":  # VM doesn't exist.
+        logging.info("VM %s doesn't exist.", name)
+        return
+    vm_id = get_vm_node_id(node)
+    try:
+        async with _aec2_client(region) as ec2:
+            await _rate_limiter(region).aacquire()
+            await ec2.terminate_instances(InstanceIds=[vm_id])
+            # Cached VM info is now stale.
+            _describe_cache.clear()
+            logging.info("Waiting for deletion of VM %s %s to complete.", name, vm_id)
+            await ec2.get_waiter("instance_terminated").wait(
+                InstanceIds=[vm_id],
+                WaiterConfig={"Delay": _WAITER_DELAY_S, "MaxAttempts": _WAITER_MAX_ATTEMPTS},
+            )
+        logging.info("Deletion of VM %s is complete.", name)
+    except (botocore.exceptions.ClientError, botocore.exceptions.WaiterError) as e:
+        raise VMDeletionError(f"Failed to delete VM {name} {vm_id}") from e
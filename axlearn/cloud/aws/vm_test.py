@@ -0,0 +1,692 @@
+# Copyright © 2023 Apple Inc.
+
+"""Tests VM utilities."""
+
+import asyncio
+import sys
+from typing import Optional
+from unittest import mock
+
+import botocore.exceptions
+from absl.testing import parameterized
+
+from axlearn.cloud.aws import vm
+
+
+def _reservation(name: Optional[str], instance_id: str, status: str = "running"):
+    instance = {"InstanceId": instance_id, "State": {"Name": status}}
+    if name is not None:
+        instance["Tags"] = [{"Key": "Name", "Value": name}]
+    return {"Instances": [instance]}
+
+
+def _client_error(code: str) -> botocore.exceptions.ClientError:
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code, "Message": "test"}}, "test_operation"
+    )
+
+
+_CREATE_VM_KWARGS = dict(
+    region=None,
+    ami_id="ami",
+    instance_type="type",
+    key_pair_name="key",
+    volume_size=1,
+    iam_role_name="role",
+    bundler_type="docker",
+)
+
+
+class VmUtilsTest(parameterized.TestCase):
+    """Tests VM utils."""
+
+    def setUp(self):
+        super().setUp()
+        vm._ec2_client.cache_clear()
+        vm._ensure_security_group.cache_clear()
+        vm._aioboto3_session.cache_clear()
+        vm._describe_cache.clear()
+        # Rate limiting is tested separately.
+        self.mock_rate_limiter = self.enter_context(mock.patch(f"{vm.__name__}._rate_limiter"))
+
+    def tearDown(self):
+        vm._ec2_client.cache_clear()
+        vm._ensure_security_group.cache_clear()
+        vm._aioboto3_session.cache_clear()
+        vm._describe_cache.clear()
+        super().tearDown()
+
+    def _mock_ec2_client(self, reservations):
+        client = mock.MagicMock()
+        client.get_paginator.return_value.paginate.return_value = [{"Reservations": reservations}]
+        client.describe_vpcs.return_value = {"Vpcs": [{"VpcId": "vpc"}]}
+        return mock.patch(f"{vm.__name__}._ec2_client", return_value=client), client
+
+    def test_ec2_client(self):
+        with mock.patch("boto3.client") as mock_client:
+            client = vm._ec2_client("us-west-2")
+            # Clients should be reused within a region.
+            self.assertIs(client, vm._ec2_client("us-west-2"))
+            self.assertEqual(1, mock_client.call_count)
+            # Different regions get different clients.
+            vm._ec2_client("us-east-1")
+            self.assertEqual(2, mock_client.call_count)
+            for call, region in zip(mock_client.call_args_list, ["us-west-2", "us-east-1"]):
+                self.assertEqual(("ec2",), call.args)
+                self.assertEqual(region, call.kwargs["region_name"])
+                # Throttling and transient errors should be retried by botocore.
+                self.assertEqual(vm._EC2_RETRIES, call.kwargs["config"].retries)
+
+    def test_get_vm_nodes(self):
+        patch, client = self._mock_ec2_client([])
+        paginate = client.get_paginator.return_value.paginate
+        paginate.return_value = [
+            {
+                "Reservations": [
+                    _reservation("a", "1", "terminated"),
+                    _reservation("b", "2"),
+                    _reservation("a", "3"),
+                ]
+            },
+            {
+                "Reservations": [
+                    _reservation("b", "4", "terminated"),
+                    _reservation("c", "5", "terminated"),
+                    _reservation("c", "6", "terminated"),
+                ]
+            },
+        ]
+        with patch:
+            nodes = vm.get_vm_nodes(["c", "a", "b", "d"])
+            # A single paginated call should describe all VMs.
+            client.get_paginator.assert_called_once_with("describe_instances")
+            paginate.assert_called_once_with(
+                Filters=[{"Name": "tag:Name", "Values": ["a", "b", "c", "d"]}],
+                PaginationConfig={"PageSize": vm._DESCRIBE_PAGE_SIZE},
+            )
+            # Non-terminated VMs take precedence. Otherwise, the last one does.
+            self.assertEqual(
+                {"a": "3", "b": "2", "c": "6"},
+                {name: vm.get_vm_node_id(node) for name, node in nodes.items()},
+            )
+            self.assertEqual("3", vm.get_vm_node_id(vm.get_vm_node("a")))
+            self.assertIsNone(vm.get_vm_node("d"))
+
+    def test_rate_limiter(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.return_value = {"SecurityGroups": [{"GroupId": "sg"}]}
+        client.run_instances.return_value = {"Instances": [{"InstanceId": "1"}]}
+        with patch:
+            vm.create_vm("test", **_CREATE_VM_KWARGS)
+            # Describing the VM, the default VPC and the security group, and launching are rate
+            # limited.
+            self.assertEqual(4, self.mock_rate_limiter.return_value.acquire.call_count)
+            self.mock_rate_limiter.assert_called_with(None)
+
+    def test_get_vm_nodes_many(self):
+        patch, client = self._mock_ec2_client([_reservation("vm-000", "1")])
+        paginate = client.get_paginator.return_value.paginate
+        names = [f"vm-{i:03d}" for i in range(vm._DESCRIBE_FILTER_MAX_VALUES + 1)]
+        with patch:
+            nodes = vm.get_vm_nodes(list(reversed(names)))
+            # Names should be split across calls, each within the limit of filter values.
+            self.assertEqual(
+                [
+                    mock.call(
+                        Filters=[{"Name": "tag:Name", "Values": values}],
+                        PaginationConfig={"PageSize": vm._DESCRIBE_PAGE_SIZE},
+                    )
+                    for values in [names[:-1], names[-1:]]
+                ],
+                paginate.call_args_list,
+            )
+            self.assertEqual(2, self.mock_rate_limiter.return_value.acquire.call_count)
+            self.assertEqual({"vm-000": "1"}, {k: vm.get_vm_node_id(v) for k, v in nodes.items()})
+
+    def test_get_vm_nodes_multiple_instances(self):
+        # Instances launched together share a reservation.
+        reservation = _reservation("a", "1")
+        reservation["Instances"].extend(
+            _reservation("c", "2")["Instances"] + _reservation("d", "3", "terminated")["Instances"]
+        )
+        patch, client = self._mock_ec2_client([reservation])
+        with patch:
+            nodes = vm.get_vm_nodes(["a", "c", "d"])
+            self.assertEqual(
+                {"a": "1", "c": "2", "d": "3"},
+                {name: vm.get_vm_node_id(node) for name, node in nodes.items()},
+            )
+            self.assertEqual("terminated", vm.get_vm_node_status(nodes["d"]))
+            vm.delete_vms(["a", "c", "d"])
+            client.terminate_instances.assert_called_once_with(InstanceIds=["1", "2"])
+
+    def test_get_vm_nodes_empty(self):
+        patch, client = self._mock_ec2_client([])
+        with patch:
+            self.assertEqual({}, vm.get_vm_nodes([]))
+            client.get_paginator.return_value.paginate.assert_not_called()
+
+    def test_get_vm_nodes_cache(self):
+        patch, client = self._mock_ec2_client([_reservation("a", "1")])
+        with patch, mock.patch(f"{vm.__name__}.time.monotonic", return_value=0) as mock_time:
+            nodes = vm.get_vm_nodes(["a", "b"])
+            # Mutating the results should not affect the cache.
+            nodes["a"]["Instances"][0]["InstanceId"] = "2"
+            # Results are reused within the TTL, regardless of order of names.
+            mock_time.return_value = vm._DESCRIBE_CACHE_TTL_S - 1
+            self.assertEqual("1", vm.get_vm_node_id(vm.get_vm_nodes(["b", "a"])["a"]))
+            self.assertEqual(1, client.get_paginator.return_value.paginate.call_count)
+
+            # Results expire after the TTL, and expired entries are evicted.
+            mock_time.return_value = vm._DESCRIBE_CACHE_TTL_S
+            vm.get_vm_node("b")
+            self.assertEqual(2, client.get_paginator.return_value.paginate.call_count)
+            self.assertEqual([(None, ("b",))], list(vm._describe_cache.keys()))
+
+    def test_get_vm_nodes_cache_size(self):
+        patch, client = self._mock_ec2_client([])
+        with patch, mock.patch(f"{vm.__name__}.time.monotonic", return_value=0):
+            for i in range(vm._DESCRIBE_CACHE_MAX_SIZE + 1):
+                vm.get_vm_node(f"vm-{i}")
+            self.assertEqual(
+                vm._DESCRIBE_CACHE_MAX_SIZE + 1,
+                client.get_paginator.return_value.paginate.call_count,
+            )
+            self.assertEqual(vm._DESCRIBE_CACHE_MAX_SIZE, len(vm._describe_cache))
+            # The oldest entry is evicted.
+            self.assertNotIn((None, ("vm-0",)), vm._describe_cache)
+
+    def test_get_vm_nodes_cache_concurrent_clear(self):
+        patch, client = self._mock_ec2_client([])
+
+        def paginate(**kwargs):
+            del kwargs
+            # Simulate another thread clearing the cache during the call.
+            vm._describe_cache.clear()
+            return []
+
+        with patch, mock.patch(f"{vm.__name__}.time.monotonic", return_value=0):
+            for i in range(vm._DESCRIBE_CACHE_MAX_SIZE):
+                vm.get_vm_node(f"vm-{i}")
+            client.get_paginator.return_value.paginate.side_effect = paginate
+            # Evicting from a cache that was emptied concurrently should not raise.
+            self.assertEqual({}, vm.get_vm_nodes(["other"]))
+            self.assertIn((None, ("other",)), vm._describe_cache)
+
+    def test_create_vm_clears_cache(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.return_value = {"SecurityGroups": [{"GroupId": "sg"}]}
+        client.run_instances.return_value = {"Instances": [{"InstanceId": "1"}]}
+        with patch:
+            vm.get_vm_node("other")
+            instance_id = vm.create_vm("test", **_CREATE_VM_KWARGS)
+            self.assertEqual("1", instance_id)
+            client.run_instances.assert_called_once()
+            # A single VM should be named at launch.
+            self.assertEqual(
+                [{"ResourceType": "instance", "Tags": [{"Key": "Name", "Value": "test"}]}],
+                client.run_instances.call_args.kwargs["TagSpecifications"],
+            )
+            client.create_tags.assert_not_called()
+            client.get_waiter.assert_called_once_with("instance_status_ok")
+            client.get_waiter.return_value.wait.assert_called_once_with(
+                InstanceIds=["1"],
+                WaiterConfig={"Delay": vm._WAITER_DELAY_S, "MaxAttempts": vm._WAITER_MAX_ATTEMPTS},
+            )
+            self.assertEqual({}, vm._describe_cache)
+
+    @parameterized.parameters(
+        dict(code="InsufficientInstanceCapacity", expected_error=None),
+        dict(code="RequestLimitExceeded", expected_error=None),
+        dict(code="InvalidAMIID.NotFound", expected_error=botocore.exceptions.ClientError),
+    )
+    def test_create_vm_retry(self, code, expected_error):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.return_value = {"SecurityGroups": [{"GroupId": "sg"}]}
+        client.run_instances.side_effect = [
+            _client_error(code),
+            {"Instances": [{"InstanceId": "1"}]},
+        ]
+        with patch, mock.patch(f"{vm.__name__}.time.sleep") as mock_sleep:
+            if expected_error:
+                with self.assertRaises(expected_error):
+                    vm.create_vm("test", **_CREATE_VM_KWARGS)
+                mock_sleep.assert_not_called()
+            else:
+                self.assertEqual("1", vm.create_vm("test", **_CREATE_VM_KWARGS))
+                self.assertEqual(2, client.run_instances.call_count)
+                mock_sleep.assert_called_once()
+                # Retries should only re-issue `run_instances`.
+                client.describe_security_groups.assert_called_once()
+                client.get_paginator.return_value.paginate.assert_called_once()
+
+    def test_create_vm_max_attempts(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.return_value = {"SecurityGroups": [{"GroupId": "sg"}]}
+        client.run_instances.side_effect = _client_error("InsufficientInstanceCapacity")
+        with patch, mock.patch(f"{vm.__name__}.time.sleep") as mock_sleep:
+            with self.assertRaises(vm.VMCreationError):
+                vm.create_vm("test", **_CREATE_VM_KWARGS)
+            self.assertEqual(vm._MAX_ATTEMPTS, client.run_instances.call_count)
+            self.assertEqual(vm._MAX_ATTEMPTS - 1, mock_sleep.call_count)
+
+    def test_next_backoff(self):
+        backoff = vm._BACKOFF_BASE_S
+        for _ in range(20):
+            next_backoff = vm._next_backoff(backoff)
+            self.assertGreaterEqual(next_backoff, vm._BACKOFF_BASE_S)
+            self.assertLessEqual(next_backoff, min(vm._BACKOFF_CAP_S, backoff * 3))
+            backoff = next_backoff
+
+    def test_ensure_security_group_found(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.return_value = {
+            "SecurityGroups": [{"GroupId": "sg", "GroupName": vm._SECURITY_GROUP_NAME}],
+            "ResponseMetadata": {},
+        }
+        with patch:
+            self.assertEqual({"GroupId": "sg"}, vm._ensure_security_group("us-west-2"))
+            # Lookups should be cached.
+            self.assertEqual({"GroupId": "sg"}, vm._ensure_security_group("us-west-2"))
+            client.describe_vpcs.assert_called_once_with(
+                Filters=[{"Name": "is-default", "Values": ["true"]}]
+            )
+            client.describe_security_groups.assert_called_once_with(
+                Filters=[
+                    {"Name": "group-name", "Values": [vm._SECURITY_GROUP_NAME]},
+                    {"Name": "vpc-id", "Values": ["vpc"]},
+                ]
+            )
+            client.create_security_group.assert_not_called()
+
+    def test_ensure_security_group_not_found(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.return_value = {"SecurityGroups": []}
+        client.create_security_group.return_value = {"GroupId": "sg", "ResponseMetadata": {}}
+        with patch:
+            self.assertEqual({"GroupId": "sg"}, vm._ensure_security_group("us-west-2"))
+            # The security group should be created in the default VPC.
+            self.assertEqual("vpc", client.create_security_group.call_args.kwargs["VpcId"])
+            client.authorize_security_group_ingress.assert_called_once()
+            self.assertEqual(
+                "sg", client.authorize_security_group_ingress.call_args.kwargs["GroupId"]
+            )
+
+    def test_ensure_security_group_error(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.side_effect = _client_error("AuthFailure")
+        with patch, self.assertRaises(botocore.exceptions.ClientError):
+            vm._ensure_security_group("us-west-2")
+        client.create_security_group.assert_not_called()
+
+    def test_ensure_security_group_no_default_vpc(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_vpcs.return_value = {"Vpcs": []}
+        with patch, self.assertRaisesRegex(vm.VMCreationError, "default VPC"):
+            vm._ensure_security_group("us-west-2")
+        client.describe_security_groups.assert_not_called()
+        client.create_security_group.assert_not_called()
+
+    def test_create_vms(self):
+        patch, client = self._mock_ec2_client([_reservation("b", "9")])
+        client.describe_security_groups.return_value = {"SecurityGroups": [{"GroupId": "sg"}]}
+        client.run_instances.return_value = {
+            "Instances": [{"InstanceId": "1"}, {"InstanceId": "2"}]
+        }
+        with patch:
+            self.assertEqual(["1", "9", "2"], vm.create_vms(["a", "b", "c"], **_CREATE_VM_KWARGS))
+            # New VMs should be launched with a single request.
+            client.run_instances.assert_called_once()
+            params = client.run_instances.call_args.kwargs
+            self.assertEqual((2, 2), (params["MinCount"], params["MaxCount"]))
+            # New VMs share a batch tag, and are named after launch.
+            (tag,) = params["TagSpecifications"][0]["Tags"]
+            self.assertEqual(vm._BATCH_TAG_KEY, tag["Key"])
+            self.assertEqual(
+                [
+                    mock.call(Resources=["1"], Tags=[{"Key": "Name", "Value": "a"}]),
+                    mock.call(Resources=["2"], Tags=[{"Key": "Name", "Value": "c"}]),
+                ],
+                client.create_tags.call_args_list,
+            )
+            # New VMs should be waited on together.
+            client.get_waiter.return_value.wait.assert_called_once_with(
+                InstanceIds=["1", "2"],
+                WaiterConfig={"Delay": vm._WAITER_DELAY_S, "MaxAttempts": vm._WAITER_MAX_ATTEMPTS},
+            )
+
+    @parameterized.parameters(None, _client_error("InternalError"))
+    def test_create_vms_tag_error(self, terminate_error):
+        patch, client = self._mock_ec2_client([])
+        client.run_instances.return_value = {
+            "Instances": [{"InstanceId": "1"}, {"InstanceId": "2"}]
+        }
+        client.create_tags.side_effect = [None, _client_error("InternalError")]
+        client.terminate_instances.side_effect = terminate_error
+        with patch, self.assertRaisesRegex(vm.VMCreationError, r"\['1', '2'\]"):
+            vm.create_vms(["a", "b"], **_CREATE_VM_KWARGS)
+        # Untagged VMs should be terminated.
+        client.terminate_instances.assert_called_once_with(InstanceIds=["1", "2"])
+        client.get_waiter.assert_not_called()
+        # Requests should be rate limited: describing the VMs, the default VPC and the security
+        # group, launching, tagging twice and terminating.
+        self.assertEqual(7, self.mock_rate_limiter.return_value.acquire.call_count)
+
+    @parameterized.parameters(["a", "a"], ["a", "1-invalid"])
+    def test_create_vms_invalid_names(self, *names):
+        with self.assertRaises(ValueError):
+            vm.create_vms(names, **_CREATE_VM_KWARGS)
+
+    def test_create_vm_deleted_security_group(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.side_effect = [
+            {"SecurityGroups": [{"GroupId": "deleted"}]},
+            {"SecurityGroups": [{"GroupId": "sg"}]},
+        ]
+        client.run_instances.side_effect = [
+            _client_error("InvalidGroup.NotFound"),
+            {"Instances": [{"InstanceId": "1"}]},
+        ]
+        with patch:
+            self.assertEqual("1", vm.create_vm("test", **_CREATE_VM_KWARGS))
+            self.assertEqual(
+                ["deleted", "sg"],
+                [
+                    call.kwargs["SecurityGroupIds"][0]
+                    for call in client.run_instances.call_args_list
+                ],
+            )
+            # The new security group should be cached.
+            self.assertEqual({"GroupId": "sg"}, vm._ensure_security_group(None))
+
+    @parameterized.parameters(
+        dict(status="pending", expected_waiters=["instance_running"], expect_start=False),
+        dict(status="stopped", expected_waiters=["instance_running"], expect_start=True),
+        dict(
+            status="stopping",
+            expected_waiters=["instance_stopped", "instance_running"],
+            expect_start=True,
+        ),
+    )
+    def test_create_vm_existing(self, status, expected_waiters, expect_start):
+        patch, client = self._mock_ec2_client([_reservation("test", "1", status)])
+        with patch:
+            self.assertEqual("1", vm.create_vm("test", **_CREATE_VM_KWARGS))
+            self.assertEqual(
+                [mock.call(waiter) for waiter in expected_waiters], client.get_waiter.call_args_list
+            )
+            client.get_waiter.return_value.wait.assert_called_with(
+                InstanceIds=["1"],
+                WaiterConfig={"Delay": vm._WAITER_DELAY_S, "MaxAttempts": vm._WAITER_MAX_ATTEMPTS},
+            )
+            if expect_start:
+                # Stopped VMs should be started, rather than waited on forever.
+                client.start_instances.assert_called_once_with(InstanceIds=["1"])
+            else:
+                client.start_instances.assert_not_called()
+            client.run_instances.assert_not_called()
+
+    def test_create_vm_existing_start_error(self):
+        patch, client = self._mock_ec2_client([_reservation("test", "1", "stopped")])
+        client.start_instances.side_effect = _client_error("IncorrectInstanceState")
+        with patch, self.assertRaises(vm.VMCreationError):
+            vm.create_vm("test", **_CREATE_VM_KWARGS)
+        client.get_waiter.assert_not_called()
+
+    def test_create_vm_existing_running(self):
+        patch, client = self._mock_ec2_client([_reservation("test", "1")])
+        with patch:
+            self.assertEqual("1", vm.create_vm("test", **_CREATE_VM_KWARGS))
+            client.get_waiter.assert_not_called()
+
+    def test_create_vm_existing_timeout(self):
+        patch, client = self._mock_ec2_client([_reservation("test", "1", "pending")])
+        client.get_waiter.return_value.wait.side_effect = botocore.exceptions.WaiterError(
+            name="instance_running", reason="timeout", last_response={}
+        )
+        with patch, self.assertRaises(vm.VMCreationError):
+            vm.create_vm("test", **_CREATE_VM_KWARGS)
+
+    def test_create_vm_status_timeout(self):
+        patch, client = self._mock_ec2_client([])
+        client.describe_security_groups.return_value = {"SecurityGroups": [{"GroupId": "sg"}]}
+        client.run_instances.return_value = {"Instances": [{"InstanceId": "1"}]}
+        client.get_waiter.return_value.wait.side_effect = botocore.exceptions.WaiterError(
+            name="instance_status_ok", reason="timeout", last_response={}
+        )
+        with patch, self.assertRaises(vm.VMCreationError):
+            vm.create_vm("test", **_CREATE_VM_KWARGS)
+
+    def test_create_vm_shutting_down(self):
+        patch, client = self._mock_ec2_client([_reservation("test", "1", "shutting-down")])
+        client.describe_security_groups.return_value = {"SecurityGroups": [{"GroupId": "sg"}]}
+        client.run_instances.return_value = {"Instances": [{"InstanceId": "2"}]}
+        with patch:
+            self.assertEqual("2", vm.create_vm("test", **_CREATE_VM_KWARGS))
+            self.assertEqual(
+                [mock.call("instance_terminated"), mock.call("instance_status_ok")],
+                client.get_waiter.call_args_list,
+            )
+            # The terminated VM is recreated without describing it again.
+            client.get_paginator.return_value.paginate.assert_called_once()
+
+    @parameterized.parameters(
+        dict(reservations=[]),
+        dict(reservations=[_reservation("test", "1", "terminated")]),
+    )
+    def test_delete_vm_missing(self, reservations):
+        patch, client = self._mock_ec2_client(reservations)
+        with patch:
+            vm.delete_vm("test")
+            client.terminate_instances.assert_not_called()
+
+    def test_delete_vm(self):
+        patch, client = self._mock_ec2_client([_reservation("test", "1")])
+        with patch:
+            vm.get_vm_node("test")
+            vm.delete_vm("test")
+            client.terminate_instances.assert_called_once_with(InstanceIds=["1"])
+            client.get_waiter.assert_called_once_with("instance_terminated")
+            self.assertEqual({}, vm._describe_cache)
+
+    def test_delete_vms(self):
+        patch, client = self._mock_ec2_client(
+            [_reservation("a", "1"), _reservation("b", "2", "terminated"), _reservation("c", "3")]
+        )
+        with patch:
+            vm.delete_vms(["a", "b", "c", "d"])
+            # Existing VMs should be deleted and waited on together.
+            client.terminate_instances.assert_called_once_with(InstanceIds=["1", "3"])
+            client.get_waiter.return_value.wait.assert_called_once_with(
+                InstanceIds=["1", "3"],
+                WaiterConfig={"Delay": vm._WAITER_DELAY_S, "MaxAttempts": vm._WAITER_MAX_ATTEMPTS},
+            )
+
+    def test_delete_vm_error(self):
+        patch, client = self._mock_ec2_client([_reservation("test", "1")])
+        client.terminate_instances.side_effect = _client_error("UnauthorizedOperation")
+        with patch, self.assertRaises(vm.VMDeletionError):
+            vm.delete_vm("test")
+
+
+class TokenBucketTest(parameterized.TestCase):
+    """Tests _TokenBucket."""
+
+    def test_acquire(self):
+        with mock.patch(f"{vm.__name__}.time") as mock_time:
+            mock_time.monotonic.return_value = 0
+            bucket = vm._TokenBucket(rate=2, capacity=3)
+            # Bursts up to capacity should not block.
+            for _ in range(3):
+                bucket.acquire()
+            mock_time.sleep.assert_not_called()
+            # Subsequent calls wait in turn for tokens to be added.
+            bucket.acquire()
+            bucket.acquire()
+            self.assertEqual([mock.call(0.5), mock.call(1.0)], mock_time.sleep.call_args_list)
+            # Tokens are added over time, up to capacity.
+            mock_time.sleep.reset_mock()
+            mock_time.monotonic.return_value = 100
+            for _ in range(3):
+                bucket.acquire()
+            mock_time.sleep.assert_not_called()
+            bucket.acquire()
+            mock_time.sleep.assert_called_once_with(0.5)
+
+    def test_aacquire(self):
+        with mock.patch(f"{vm.__name__}.time") as mock_time, mock.patch(
+            f"{vm.__name__}.asyncio.sleep"
+        ) as mock_sleep:
+            mock_time.monotonic.return_value = 0
+            bucket = vm._TokenBucket(rate=2, capacity=1)
+            asyncio.run(bucket.aacquire())
+            mock_sleep.assert_not_called()
+            # Waiting should not block the event loop.
+            asyncio.run(bucket.aacquire())
+            mock_sleep.assert_called_once_with(0.5)
+            mock_time.sleep.assert_not_called()
+
+
+class AsyncVmUtilsTest(parameterized.TestCase):
+    """Tests async VM utils."""
+
+    def setUp(self):
+        super().setUp()
+        vm._aioboto3_session.cache_clear()
+        vm._describe_cache.clear()
+        self.mock_rate_limiter = self.enter_context(
+            mock.patch(f"{vm.__name__}._rate_limiter", return_value=mock.AsyncMock())
+        )
+
+    def tearDown(self):
+        vm._aioboto3_session.cache_clear()
+        vm._describe_cache.clear()
+        super().tearDown()
+
+    def _mock_aec2_client(self, reservations):
+        client = mock.AsyncMock()
+        client.get_paginator = mock.MagicMock()
+        pages = client.get_paginator.return_value.paginate.return_value
+        pages.__aiter__.return_value = [{"Reservations": reservations}]
+        client.get_waiter = mock.Mock()
+        client.get_waiter.return_value.wait = mock.AsyncMock()
+        session = mock.MagicMock()
+        session.client.return_value.__aenter__.return_value = client
+        return mock.patch(f"{vm.__name__}._aioboto3_session", return_value=session), client
+
+    def test_missing_aioboto3(self):
+        with mock.patch.dict(sys.modules, {"aioboto3": None}), self.assertRaises(
+            ModuleNotFoundError
+        ):
+            asyncio.run(vm.aget_vm_node("test"))
+
+    def test_aget_vm_nodes(self):
+        patch, client = self._mock_aec2_client(
+            [_reservation("a", "1"), _reservation("b", "2", "terminated")]
+        )
+        with patch:
+            nodes = asyncio.run(vm.aget_vm_nodes(["b", "a", "c"]))
+            client.get_paginator.assert_called_once_with("describe_instances")
+            client.get_paginator.return_value.paginate.assert_called_once_with(
+                Filters=[{"Name": "tag:Name", "Values": ["a", "b", "c"]}],
+                PaginationConfig={"PageSize": vm._DESCRIBE_PAGE_SIZE},
+            )
+            self.assertEqual(
+                {"a": "1", "b": "2"},
+                {name: vm.get_vm_node_id(node) for name, node in nodes.items()},
+            )
+
+    def test_aget_vm_nodes_many(self):
+        patch, client = self._mock_aec2_client([])
+        names = [f"vm-{i:03d}" for i in range(vm._DESCRIBE_FILTER_MAX_VALUES + 1)]
+        with patch:
+            asyncio.run(vm.aget_vm_nodes(names))
+            self.assertEqual(
+                [names[:-1], names[-1:]],
+                [
+                    call.kwargs["Filters"][0]["Values"]
+                    for call in client.get_paginator.return_value.paginate.call_args_list
+                ],
+            )
+
+    @parameterized.parameters(
+        dict(errors=[]),
+        dict(errors=["InsufficientInstanceCapacity"]),
+    )
+    def test_acreate_vm(self, errors):
+        patch, client = self._mock_aec2_client([])
+        client.run_instances.side_effect = [_client_error(code) for code in errors] + [
+            {"Instances": [{"InstanceId": "1"}]}
+        ]
+        with patch, mock.patch(
+            f"{vm.__name__}._ensure_security_group", return_value={"GroupId": "sg"}
+        ), mock.patch(f"{vm.__name__}.asyncio.sleep") as mock_sleep:
+            self.assertEqual("1", asyncio.run(vm.acreate_vm("test", **_CREATE_VM_KWARGS)))
+            self.assertEqual(len(errors) + 1, client.run_instances.call_count)
+            self.assertEqual(len(errors), mock_sleep.call_count)
+            client.get_waiter.assert_called_once_with("instance_status_ok")
+
+    def test_acreate_vm_deleted_security_group(self):
+        patch, client = self._mock_aec2_client([])
+        client.run_instances.side_effect = [
+            _client_error("InvalidGroup.NotFound"),
+            {"Instances": [{"InstanceId": "1"}]},
+        ]
+        with patch, mock.patch(
+            f"{vm.__name__}._ensure_security_group",
+            side_effect=[{"GroupId": "deleted"}, {"GroupId": "sg"}],
+        ) as mock_ensure, mock.patch(f"{vm.__name__}.asyncio.sleep") as mock_sleep:
+            self.assertEqual("1", asyncio.run(vm.acreate_vm("test", **_CREATE_VM_KWARGS)))
+            # The security group should be resolved again, without backoff.
+            mock_ensure.cache_clear.assert_called_once()
+            self.assertEqual(
+                [["deleted"], ["sg"]],
+                [call.kwargs["SecurityGroupIds"] for call in client.run_instances.call_args_list],
+            )
+            mock_sleep.assert_not_called()
+            # Describing the VM and each launch are rate limited.
+            self.assertEqual(3, self.mock_rate_limiter.return_value.aacquire.call_count)
+
+    def test_acreate_vm_max_attempts(self):
+        patch, client = self._mock_aec2_client([])
+        client.run_instances.side_effect = _client_error("InternalError")
+        with patch, mock.patch(
+            f"{vm.__name__}._ensure_security_group", return_value={"GroupId": "sg"}
+        ), mock.patch(f"{vm.__name__}.asyncio.sleep"), self.assertRaises(vm.VMCreationError):
+            asyncio.run(vm.acreate_vm("test", **_CREATE_VM_KWARGS))
+        self.assertEqual(vm._MAX_ATTEMPTS, client.run_instances.call_count)
+
+    def test_acreate_vm_error(self):
+        patch, client = self._mock_aec2_client([])
+        client.run_instances.side_effect = _client_error("InvalidAMIID.NotFound")
+        with patch, mock.patch(
+            f"{vm.__name__}._ensure_security_group", return_value={"GroupId": "sg"}
+        ), self.assertRaises(botocore.exceptions.ClientError):
+            asyncio.run(vm.acreate_vm("test", **_CREATE_VM_KWARGS))
+
+    @parameterized.parameters(
+        dict(status="running", expected_waiters=[], expect_start=False),
+        dict(status="pending", expected_waiters=["instance_running"], expect_start=False),
+        dict(status="stopped", expected_waiters=["instance_running"], expect_start=True),
+        dict(
+            status="stopping",
+            expected_waiters=["instance_stopped", "instance_running"],
+            expect_start=True,
+        ),
+    )
+    def test_acreate_vm_existing(self, status, expected_waiters, expect_start):
+        patch, client = self._mock_aec2_client([_reservation("test", "1", status)])
+        with patch:
+            self.assertEqual("1", asyncio.run(vm.acreate_vm("test", **_CREATE_VM_KWARGS)))
+            client.run_instances.assert_not_called()
+            self.assertEqual(
+                [mock.call(waiter) for waiter in expected_waiters], client.get_waiter.call_args_list
+            )
+            self.assertEqual(expect_start, client.start_instances.called)
+
+    def test_adelete_vm(self):
+        patch, client = self._mock_aec2_client([_reservation("test", "1")])
+        with patch:
+            asyncio.run(vm.adelete_vm("test"))
+            client.terminate_instances.assert_called_once_with(InstanceIds=["1"])
+            client.get_waiter.assert_called_once_with("instance_terminated")
@@ -12,6 +12,8 @@ The config file should be named `.axlearn.config`, and can live in one of the fo
    invoking the CLI from outside the repo.
 """
 
+import copy
+import functools
 import os
 import sys
 from typing import Any, Dict, Optional, Sequence, Tuple
@@ -24,6 +26,8 @@ from axlearn.cloud.common import utils
 CONFIG_DIR = ".axlearn"  # Relative to root of project.
 CONFIG_FILE = ".axlearn.config"
 DEFAULT_CONFIG_FILE = "axlearn.default.config"
+# Incremented whenever configs are written, so that cached settings can detect staleness.
+_CONFIG_VERSION = 0
 
 
 def load_configs(
@@ -52,13 +56,13 @@ def load_configs(
     # If a default config exists, read it.
     default_config_file = _default_config_file()
     if default_config_file is not None:
-        utils.merge(configs, toml.load(default_config_file))
+        utils.merge(configs, _read_config_file(default_config_file))
         config_file = default_config_file
 
     # If a user config file exists, use it to override the default.
     user_config_file = _locate_user_config_file()
     if user_config_file:
-        utils.merge(configs, toml.load(user_config_file))
+        utils.merge(configs, _read_config_file(user_config_file))
         config_file = user_config_file
 
     if required and config_file is None:
@@ -76,6 +80,26 @@ def load_configs(
     return config_file, configs
 
 
+@functools.lru_cache(maxsize=8)
+def _parse_config_file(config_file: str, mtime_ns: int, version: int) -> Dict[str, Any]:
+    """Parses the config file.
+
+    `mtime_ns` and `version` are only used as part of the cache key, so that the file is re-parsed
+    if it's modified either externally or in-process.
+    """
+    del mtime_ns, version
+    return toml.load(config_file)
+
+
+def _read_config_file(config_file: str) -> Dict[str, Any]:
+    """Reads the config file, re-parsing it only if it has been modified since the last read.
+
+    A copy is returned, so callers are free to mutate the configs.
+    """
+    mtime_ns = os.stat(config_file).st_mtime_ns
+    return copy.deepcopy(_parse_config_file(config_file, mtime_ns, _CONFIG_VERSION))
+
+
 def write_configs_with_header(config_file: str, configs: Dict[str, Any]):
     """Writes configs to a file, with a prepended comment warning users not to modify it.
 
@@ -83,11 +107,13 @@ def write_configs_with_header(config_file: str, configs: Dict[str, Any]):
         config_file: Output file path.
         configs: Configs to serialize.
     """
+    global _CONFIG_VERSION  # pylint: disable=global-statement
     header = "# WARNING: This is a partially generated file. Modify with care.\n"
     body = toml.dumps(configs)
     with open(config_file, "w", encoding="utf-8") as f:
         f.seek(0, 0)
         f.write(f"{header}\n{body}")
+    _CONFIG_VERSION += 1
 
 
 def update_configs(namespace: str, namespace_configs: Dict[str, Any]):
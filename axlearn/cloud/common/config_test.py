@@ -12,6 +12,7 @@ from absl import flags
 from absl.testing import parameterized
 
 from axlearn.cloud import ROOT_MODULE_NAME
+from axlearn.cloud.common import config
 from axlearn.cloud.common.config import (
     CONFIG_DIR,
     DEFAULT_CONFIG_FILE,
@@ -189,6 +190,29 @@ class ConfigTest(TestWithTemporaryCWD):
         self.assertEqual(config_file, str(path))
         self.assertEqual(configs, {"a": 4, "b": 3})
 
+    def test_load_configs_cached(self):
+        temp_root = pathlib.Path(os.path.realpath(self._temp_root.name))
+        _setup_fake_repo(temp_root)
+        namespace = "test"
+        default_config = create_default_config(temp_root, contents={namespace: {"a": {"b": 1}}})
+
+        with mock.patch(f"{config.__name__}.toml.load", side_effect=config.toml.load) as mock_load:
+            _, configs = load_configs(namespace)
+            self.assertEqual(configs, {"a": {"b": 1}})
+            self.assertEqual(mock_load.call_count, 1)
+
+            # Mutating the returned configs should not affect the cache.
+            configs["a"]["b"] = 2
+            _, configs = load_configs(namespace)
+            self.assertEqual(configs, {"a": {"b": 1}})
+            self.assertEqual(mock_load.call_count, 1)
+
+            # Modifying the file should invalidate the cache.
+            write_configs_with_header(str(default_config), {namespace: {"a": {"b": 3}}})
+            _, configs = load_configs(namespace)
+            self.assertEqual(configs, {"a": {"b": 3}})
+            self.assertEqual(mock_load.call_count, 2)
+
     def test_load_configs_required(self):
         temp_root = os.path.realpath(self._temp_root.name)
         _setup_fake_repo(temp_root)
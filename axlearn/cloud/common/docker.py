@@ -2,6 +2,7 @@
 
 """Utilities to invoke docker commands."""
 
+import functools
 import os
 import pathlib
 import subprocess
@@ -83,6 +84,10 @@ def _run(*args, **kwargs):
         handle_popen(proc)
 
 
+@functools.lru_cache(maxsize=16)
 def registry_from_repo(repo: str) -> str:
-    """Parse docker registry from repo."""
+    """Parse docker registry from repo.
+
+    The result is cached, since the repo typically comes from a fixed config.
+    """
     return pathlib.Path(repo).parts[0]